@@ -1,5 +1,6 @@
 import os
 import sys
+import asyncio
 from datetime import datetime
 from dotenv import load_dotenv
 from print_color import print
@@ -49,7 +50,25 @@ def list_documents(assistant: DocumentAssistant):
         print("-" * 40)
 
 
-def main():
+async def stream_response(assistant: DocumentAssistant, user_input: str):
+    """Print the answer as it streams in and return the final result"""
+    result = {}
+    streamed = False
+    async for event in assistant.astream_message(user_input):
+        if event["type"] == "token":
+            if not streamed:
+                print("\n🤖 Assistant:", end=" ")
+                streamed = True
+            print(event["content"], end="", flush=True)
+        else:
+            result = event
+    if streamed:
+        print()
+    result["streamed"] = streamed
+    return result
+
+
+async def main():
     """Main interactive loop"""
     # Load environment variables
     load_dotenv()
@@ -100,15 +119,17 @@ def main():
                 list_documents(assistant)
                 continue
 
-            # Process the message
+            # Process the message, printing the answer as it streams in
             print("\nProcessing...", color='yellow')
-            result = assistant.process_message(user_input)
+            result = await stream_response(assistant, user_input)
 
             if result["success"]:
-                print("\n🤖 Assistant:", end=" ")
+                # Answers that didn't stream (e.g. the calculator fast path) are printed whole
+                if not result["streamed"]:
+                    print("\n🤖 Assistant:", end=" ")
 
-                if result.get("response"):
-                    print(result["response"])
+                    if result.get("response"):
+                        print(result["response"])
                 if result.get("intent"):
                     intent = result["intent"]
                     print(f"\nINTENT: {intent['intent_type']}", color='green')
@@ -131,4 +152,6 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # One event loop for the whole session: the async OpenAI client is bound
+    # to the loop it first runs on, so turns must not each get a new one
+    asyncio.run(main())
@@ -1,19 +1,34 @@
 import os
 import json
-from typing import Dict, Any, List, Optional
+import asyncio
+from typing import Dict, Any, List, Optional, AsyncIterator
 from datetime import datetime
 import uuid
 
 from langchain_core.messages import BaseMessage
 from langchain_openai import ChatOpenAI
 
-from schemas import SessionState
+from schemas import SessionState, UserIntent, UpdateMemoryResponse
 from retrieval import SimulatedRetriever
 from tools import get_all_tools, ToolLogger
-from agent import create_workflow, AgentState
+from agent import create_workflow, create_guided_intent_llm, AgentState
 from prompts import MEMORY_SUMMARY_PROMPT
 
 
+# Event loop behind every synchronous process_message call. ChatOpenAI keeps
+# one async HTTP client per process, bound to the loop it first ran on, so a
+# fresh asyncio.run() per turn fails with "Event loop is closed" on turn two.
+_EVENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """Create the shared event loop on first use and reuse it afterwards."""
+    global _EVENT_LOOP
+    if _EVENT_LOOP is None or _EVENT_LOOP.is_closed():
+        _EVENT_LOOP = asyncio.new_event_loop()
+    return _EVENT_LOOP
+
+
 class DocumentAssistant:
     """
     The assistant creates and loads sessions and
@@ -25,15 +40,26 @@ class DocumentAssistant:
             openai_api_key: str,
             model_name: str = "gpt-4o",
             temperature: float = 0.1,
-            session_storage_path: str = "./sessions"
+            session_storage_path: str = "./sessions",
+            base_url: str = "https://openai.vocareum.com/v1",
+            guided_intent_decoding: bool = False
     ):
         # Initialize LLM
         self.llm = ChatOpenAI(
             api_key=openai_api_key,
             model=model_name,
             temperature=temperature,
-            base_url="https://openai.vocareum.com/v1"
+            base_url=base_url
         )
+        # Structured-output models used by classify_intent and update_memory,
+        # built once instead of on every turn. guided_intent_decoding is for
+        # vLLM / SGLang / NIM servers that support guided_choice; point
+        # base_url at such a server when enabling it.
+        if guided_intent_decoding:
+            self.intent_llm = create_guided_intent_llm(self.llm)
+        else:
+            self.intent_llm = self.llm.with_structured_output(UserIntent)
+        self.mem_llm = self.llm.with_structured_output(UpdateMemoryResponse)
 
         # Initialize components
         self.retriever = SimulatedRetriever()
@@ -69,6 +95,8 @@ class DocumentAssistant:
         # Rebind ToolLogger and tools to this session for per-session logging
         self.tool_logger = ToolLogger(logs_dir="./logs", session_id=session_id)
         self.tools = get_all_tools(self.retriever, self.tool_logger)
+        # The agent nodes are built from the tools, so rebuild the workflow too
+        self.workflow = create_workflow(self.llm, self.tools)
         return session_id
 
     def _session_exists(self, session_id: str) -> bool:
@@ -115,9 +143,72 @@ class DocumentAssistant:
         history = current_state.get("messages", [])
         return history
 
+    def _get_tools_used_count(self, config) -> int:
+        """Length of the session's cumulative tools_used before this turn."""
+        if not self.current_session or not self.current_session.conversation_history:
+            return 0
+
+        current_state = self.workflow.get_state(config).values
+
+        return len(current_state.get("tools_used", []))
+
 
     def process_message(self, user_input: str) -> Dict[str, Any]:
-        """Process a user message using the LangGraph workflow."""
+        """
+        Process a user message using the LangGraph workflow. Runs on a
+        long-lived event loop; from async code, await aprocess_message instead.
+        """
+        return _get_event_loop().run_until_complete(self.aprocess_message(user_input))
+
+    async def aprocess_message(self, user_input: str) -> Dict[str, Any]:
+        """Async variant of process_message, for callers with a running event loop."""
+        config, initial_state, tools_offset = await self._prepare_turn(user_input)
+        try:
+            # Invoke the workflow with a thread_id equal to the session_id
+            final_state = await self.workflow.ainvoke(initial_state, config=config)
+            return await self._finish_turn(final_state, tools_offset)
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "response": None
+            }
+
+    async def astream_message(self, user_input: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of aprocess_message. Yields {"type": "token", "content": ...}
+        as the agent model produces its answer, then one {"type": "result", ...}
+        event carrying the same fields aprocess_message returns.
+        """
+        config, initial_state, tools_offset = await self._prepare_turn(user_input)
+        try:
+            async for event in self.workflow.astream_events(initial_state, config=config, version="v2"):
+                # Only the ReAct agent's "agent" node writes answer text. Skip the
+                # intent / memory / structured-response calls, whose output is
+                # JSON, and chunks that belong to a tool call.
+                if (event["event"] == "on_chat_model_stream"
+                        and event["metadata"].get("langgraph_node") == "agent"):
+                    chunk = event["data"]["chunk"]
+                    if chunk.content and isinstance(chunk.content, str) and not chunk.tool_call_chunks:
+                        yield {"type": "token", "content": chunk.content}
+
+            final_state = (await self.workflow.aget_state(config)).values
+            result = await self._finish_turn(final_state, tools_offset)
+        except Exception as e:
+            result = {
+                "success": False,
+                "error": str(e),
+                "response": None
+            }
+        yield {"type": "result", **result}
+
+    async def _prepare_turn(self, user_input: str):
+        """
+        Build the config and initial state for one workflow run, plus the
+        length of tools_used before it so the result can report this turn only.
+        """
+        if not self.current_session:
+            raise ValueError("No active session. Call start_session() first.")
 
 #TODO: Complete the config dictionary to set the thread_ud, llm, and tools to the workflow
         # Refer to README.md Task 2.6 for details
@@ -125,19 +216,24 @@ class DocumentAssistant:
             "configurable": {
                 "thread_id": self.current_session.session_id,
                 "llm": self.llm,
+                "intent_llm": self.intent_llm,
+                "mem_llm": self.mem_llm,
                 "tools": self.tools,
             }
         }
 
-        if not self.current_session:
-            raise ValueError("No active session. Call start_session() first.")
+        # Blocking SQLite / file I/O runs in the default thread pool so that
+        # other sessions sharing the event loop keep making progress
+        conversation_summary, tools_offset = await asyncio.to_thread(
+            lambda: (self._get_conversation_summary(config), self._get_tools_used_count(config))
+        )
         initial_state: AgentState = {
             "messages": [],
             "user_input": user_input,
             "intent": None,
             "next_step": "classify_intent",
             "conversation_history": self.current_session.conversation_history,
-            "conversation_summary": self._get_conversation_summary(config),
+            "conversation_summary": conversation_summary,
             "active_documents": self.current_session.document_context,
             "current_response": None,
             "tools_used": [],
@@ -146,32 +242,28 @@ class DocumentAssistant:
             # Initialise actions_taken list for this turn
             "actions_taken": []
         }
-        try:
-            # Invoke the workflow with a thread_id equal to the session_id
-            final_state = self.workflow.invoke(initial_state, config=config)
-            # Update session with new state
-            if final_state.get("messages"):
-
-                self.current_session.conversation_history.append(final_state)
-                self.current_session.last_updated = datetime.now()
-                if final_state.get("active_documents"):
-                    self.current_session.document_context = list(set(
-                        self.current_session.document_context +
-                        final_state["active_documents"]
-                    ))
-                self._save_session()
-            return {
-                "success": True,
-                "response": final_state.get("messages")[-1].content if final_state.get("messages") else None,
-                "intent": final_state.get("intent").dict() if final_state.get("intent") else None,
-                "tools_used": final_state.get("tools_used", []),
-                "sources": final_state.get("active_documents", []),
-                "actions_taken": final_state.get("actions_taken", []),
-                "summary": final_state.get("conversation_summary", [])
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "response": None
-            }
\ No newline at end of file
+        return config, initial_state, tools_offset
+
+    async def _finish_turn(self, final_state: Dict[str, Any], tools_offset: int = 0) -> Dict[str, Any]:
+        """Record the finished turn in the session and build the result dict."""
+        # Update session with new state
+        if final_state.get("messages"):
+
+            self.current_session.conversation_history.append(final_state)
+            self.current_session.last_updated = datetime.now()
+            if final_state.get("active_documents"):
+                self.current_session.document_context = list(set(
+                    self.current_session.document_context +
+                    final_state["active_documents"]
+                ))
+            await asyncio.to_thread(self._save_session)
+        return {
+            "success": True,
+            "response": final_state.get("messages")[-1].content if final_state.get("messages") else None,
+            "intent": final_state.get("intent").dict() if final_state.get("intent") else None,
+            # The checkpointed list spans the whole session; report this turn's part
+            "tools_used": final_state.get("tools_used", [])[tools_offset:],
+            "sources": final_state.get("active_documents", []),
+            "actions_taken": final_state.get("actions_taken", []),
+            "summary": final_state.get("conversation_summary", [])
+        }
\ No newline at end of file
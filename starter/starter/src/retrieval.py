@@ -4,6 +4,9 @@ from dataclasses import dataclass
 import re
 from schemas import DocumentChunk
 
+# Dollar amounts in natural language queries, e.g. "$50,000" or "1200.50"
+_AMOUNT_RE = re.compile(r'\$?(\d+(?:,\d{3})*(?:\.\d{2})?)')
+
 
 @dataclass
 class Document:
@@ -390,8 +393,7 @@ class SimulatedRetriever:
         query_lower = query.lower()
 
         # Extract amounts from query
-        amount_pattern = r'\$?(\d+(?:,\d{3})*(?:\.\d{2})?)'
-        amounts = [float(m.replace(',', '').replace('$', '')) for m in re.findall(amount_pattern, query)]
+        amounts = [float(m.replace(',', '').replace('$', '')) for m in _AMOUNT_RE.findall(query)]
 
         # Check for comparison keywords
         if any(word in query_lower for word in ['over', 'above', 'more than', 'greater than', '>']):
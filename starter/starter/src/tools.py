@@ -4,12 +4,22 @@ Think of these as the agent's Swiss Army knife - each tool has a specific purpos
 """
 
 from typing import Dict, Any, List, Optional, Literal
-from langchain_core.tools import tool
+from langchain_core.tools import tool, BaseTool, StructuredTool
 from pydantic import BaseModel, Field
+from cachetools import TTLCache
+from threading import Lock
 import re
 import json
 from datetime import datetime
 
+# Tool results shared by every session in the process. The tools only read
+# from the document store, so identical calls give identical results.
+_TOOL_RESULT_CACHE = TTLCache(maxsize=1024, ttl=300)
+_TOOL_RESULT_LOCK = Lock()
+
+# Characters the calculator accepts: digits, + - * /, parentheses, '.' and spaces
+_SAFE_EXPRESSION_RE = re.compile(r'^[\d\s+\-*/().]+$')
+
 
 class ToolLogger:
     """Logs tool usage with automatic persistence"""
@@ -30,13 +40,15 @@ class ToolLogger:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             self.log_file = os.path.join(logs_dir, f"tool_usage_{timestamp}.json")
 
-    def log_tool_use(self, tool_name: str, input_data: Dict[str, Any], output: Any):
+    def log_tool_use(self, tool_name: str, input_data: Dict[str, Any], output: Any, cached: bool = False):
         log_entry = {
             "timestamp": datetime.now().isoformat(),
             "tool_name": tool_name,
             "input": input_data,
             "output": str(output),
         }
+        if cached:
+            log_entry["cached"] = True
         self.logs.append(log_entry)
 
         # Automatically save to persistent file
@@ -86,8 +98,7 @@ def create_calculator_tool(logger: ToolLogger):
         """
         try:
             # Validate expression for security - only allow safe characters
-            import re
-            if not re.match(r'^[\d\s+\-*/().]+$', expression):
+            if not _SAFE_EXPRESSION_RE.match(expression):
                 error_msg = "Invalid expression: only digits, +, -, *, /, parentheses, and spaces are allowed"
                 logger.log_tool_use(
                     "calculator",
@@ -389,13 +400,46 @@ def create_document_statistics_tool(retriever, logger: ToolLogger):
     return document_statistics
 
 
+def create_cached_tool(base_tool: BaseTool, logger: ToolLogger, scope: Any = None) -> BaseTool:
+    """
+    Wraps a tool so repeated calls with the same arguments reuse the cached
+    result. Results are shared only between tools reading from the same
+    `scope` (the retriever); cache hits are still written to `logger`,
+    marked as cached, so every session's log lists all of its tool calls.
+    """
+
+    def run_cached(**kwargs) -> Any:
+        key = (id(scope), base_tool.name, json.dumps(kwargs, sort_keys=True, default=str))
+        with _TOOL_RESULT_LOCK:
+            entry = _TOOL_RESULT_CACHE.get(key)
+        if entry is not None:
+            result = entry[1]
+            logger.log_tool_use(base_tool.name, kwargs, result, cached=True)
+            return result
+
+        result = base_tool.invoke(kwargs)
+        with _TOOL_RESULT_LOCK:
+            # Holding scope in the entry keeps its id from being reused while cached
+            _TOOL_RESULT_CACHE[key] = (scope, result)
+        return result
+
+    return StructuredTool.from_function(
+        func=run_cached,
+        name=base_tool.name,
+        description=base_tool.description,
+        args_schema=base_tool.args_schema,
+    )
+
+
 def get_all_tools(retriever, logger: ToolLogger) -> List:
     """
     Get all available tools for the agent.
     """
-    return [
+    tools = [
         create_calculator_tool(logger),
         create_document_search_tool(retriever, logger),
         create_document_reader_tool(retriever, logger),
         create_document_statistics_tool(retriever, logger)
-    ]
\ No newline at end of file
+    ]
+    # Share tool results across turns and sessions using the same retriever
+    return [create_cached_tool(t, logger, scope=retriever) for t in tools]
\ No newline at end of file